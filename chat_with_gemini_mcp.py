@@ -23,8 +23,21 @@ except ImportError:
         exit(1)
 
 import requests # For calling the MCP server
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import atexit
+import functools
 import os
 import json
+import logging
+import sys
+import threading
+import time
+import traceback
+import cachetools
+import orjson
 
 # --- Configuration ---
 # IMPORTANT: Set your Google API Key here or as an environment variable
@@ -42,15 +55,69 @@ else:
     # Legacy SDK approach
     genai.configure(api_key=GOOGLE_API_KEY)
 
+# Diagnostic output (full MCP requests/responses) is opt-in, e.g. GEMINI_MCP_LOG_LEVEL=DEBUG
+_log_level_name = (os.environ.get("GEMINI_MCP_LOG_LEVEL") or "WARNING").upper()
+_log_level = logging.getLevelName(_log_level_name) # The level number, or a "Level ..." string if unknown
+logging.basicConfig(
+    level=_log_level if isinstance(_log_level, int) else logging.WARNING,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+if not isinstance(_log_level, int):
+    logger.warning("Unknown GEMINI_MCP_LOG_LEVEL '%s'; using WARNING.", _log_level_name)
+
 MODEL_NAME = "gemini-1.5-flash-latest" # Changed to a valid and reliable model
 MCP_SERVER_URL = "http://localhost:5003" # URL of your local mcp_server.py
+_EXEC_URL = f"{MCP_SERVER_URL}/mcp/execute"
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+MAX_PARALLEL_TOOL_CALLS = 8
+
+# The whole chat history is resent on every turn; once it grows past
+# MAX_HISTORY_ENTRIES, only the system prompt and the last ~HISTORY_WINDOW entries are kept.
+MAX_HISTORY_ENTRIES = 40
+HISTORY_WINDOW = 20
+
+# Lifetime of the Gemini context cache holding the system prompt and tools. It is
+# extended once half of it has passed, so an active chat never runs into an expired cache.
+PROMPT_CACHE_TTL_SECONDS = 3600
+
+# Reuse keep-alive connections to the MCP server for every tool call
+# instead of opening a new TCP connection per request. The pool holds one
+# connection per tool worker so parallel calls don't discard each other's sockets.
+_MCP_SESSION = requests.Session()
+_MCP_SESSION.mount("http://", HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=MAX_PARALLEL_TOOL_CALLS,
+    max_retries=Retry(total=2, backoff_factor=0.1)
+))
+atexit.register(_MCP_SESSION.close)
+
+# Long-lived workers for tool calls, shared across turns.
+_TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_PARALLEL_TOOL_CALLS, thread_name_prefix="mcp-tool")
+atexit.register(_TOOL_EXECUTOR.shutdown, wait=False)
+
+# Short-lived cache for read-only tools; Gemini often re-reads the same file
+# or directory several times within one exchange.
+_TOOL_CACHE = cachetools.TTLCache(maxsize=128, ttl=30)
+_CACHEABLE = {"read_file", "list_directory"}
+_TOOL_CACHE_LOCK = threading.Lock() # Tool calls may run concurrently
+# Bumped by every write_file invalidation; a read only stores its result if no write
+# was invalidated while it was in flight (it may have fetched pre-write content).
+_TOOL_CACHE_GENERATION = 0
 
-# Define tools as a list of dictionaries for flexibility across both SDKs
-TOOLS_CONFIG = [
-    {
-        "name": "read_file",
-        "description": "Reads the content of a specified text file from the allowed directory.",
-        "parameters": {
+# Define tools once as immutable declarations, shared by both SDKs
+@dataclass(frozen=True)
+class ToolDecl:
+    name: str
+    description: str
+    params_schema: dict
+
+TOOLS: tuple[ToolDecl, ...] = (
+    ToolDecl(
+        name="read_file",
+        description="Reads the content of a specified text file (code, README, notes) from the allowed directory. Use it whenever you need to see a file to understand or modify it, e.g. when asked what 'analyze.py' does.",
+        params_schema={
             "type": "object",
             "properties": {
                 "path": {
@@ -60,11 +127,11 @@ TOOLS_CONFIG = [
             },
             "required": ["path"]
         }
-    },
-    {
-        "name": "list_directory",
-        "description": "Lists files and subdirectories within a specified directory relative to the allowed base directory.",
-        "parameters": {
+    ),
+    ToolDecl(
+        name="list_directory",
+        description="Lists files and subdirectories within a specified directory relative to the allowed base directory. Use it to see which files are available, or first when unsure of a file's name or location.",
+        params_schema={
             "type": "object",
             "properties": {
                 "path": {
@@ -74,11 +141,11 @@ TOOLS_CONFIG = [
             },
             "required": ["path"]
         }
-    },
-    {
-        "name": "write_file",
-        "description": "Writes content to a specified file within the allowed directory. Can optionally overwrite.",
-        "parameters": {
+    ),
+    ToolDecl(
+        name="write_file",
+        description="Writes content to a specified file within the allowed directory, e.g. to save new code or a suggested update. Can optionally overwrite.",
+        params_schema={
             "type": "object",
             "properties": {
                 "path": {
@@ -91,43 +158,56 @@ TOOLS_CONFIG = [
                 },
                 "overwrite": {
                     "type": "boolean", 
-                    "description": "Set to true to overwrite if the file exists. Defaults to false."
+                    "description": "Set to true to overwrite if the file exists (required when updating an existing file). Defaults to false, which prevents accidentally replacing a file."
                 }
             },
             "required": ["path", "content"]
         }
-    }
-]
+    ),
+)
+
+# Names the MCP server knows, so hallucinated tool names can be rejected locally
+_TOOL_NAMES = frozenset(sys.intern(tool.name) for tool in TOOLS)
+
+# Convert TOOLS to the format needed by the SDK
+@functools.cache
+def _build_gemini_tools():
+    if USING_NEW_SDK:
+        # For the new SDK
+        function_declarations = []
+        for tool in TOOLS:
+            # Convert each tool declaration
+            function_declarations.append({
+                "name": tool.name,
+                "description": tool.description,
+                "parameters": {
+                    "type": tool.params_schema["type"].upper(),
+                    "properties": {
+                        k: {
+                            "type": v["type"].upper(),
+                            "description": v.get("description", "")
+                        } for k, v in tool.params_schema["properties"].items()
+                    },
+                    "required": tool.params_schema.get("required", [])
+                }
+            })
+        # Build the SDK's native Tool object once so start_chat doesn't have to
+        # re-validate the dict form on every chat.
+        try:
+            return [genai.types.Tool(
+                function_declarations=[genai.types.FunctionDeclaration.model_validate(fd) for fd in function_declarations]
+            )]
+        except AttributeError:
+            # Older SDK versions without pydantic types; pass the plain dict form
+            return [{
+                "function_declarations": function_declarations
+            }]
 
-# Convert TOOLS_CONFIG to the format needed by the SDK
-if USING_NEW_SDK:
-    # For the new SDK
-    function_declarations = []
-    for tool_config in TOOLS_CONFIG:
-        # Convert each tool configuration
-        function_declarations.append({
-            "name": tool_config["name"],
-            "description": tool_config["description"],
-            "parameters": {
-                "type": tool_config["parameters"]["type"].upper(),
-                "properties": {
-                    k: {
-                        "type": v["type"].upper(),
-                        "description": v.get("description", "")
-                    } for k, v in tool_config["parameters"]["properties"].items()
-                },
-                "required": tool_config["parameters"].get("required", [])
-            }
-        })
-    GEMINI_TOOLS = [{
-        "function_declarations": function_declarations
-    }]
-else:
     # For the legacy SDK
     function_declarations = []
-    for tool_config in TOOLS_CONFIG:
+    for tool in TOOLS:
         properties = {}
-        for prop_name, prop_config in tool_config["parameters"]["properties"].items():
+        for prop_name, prop_config in tool.params_schema["properties"].items():
             properties[prop_name] = genai.protos.Schema(
                 type=getattr(genai.protos.Type, prop_config["type"].upper()),
                 description=prop_config.get("description", "")
@@ -136,54 +216,24 @@ else:
         schema = genai.protos.Schema(
             type=genai.protos.Type.OBJECT,
             properties=properties,
-            required=tool_config["parameters"].get("required", [])
+            required=tool.params_schema.get("required", [])
         )
         
         func_decl = genai.protos.FunctionDeclaration(
-            name=tool_config["name"],
-            description=tool_config["description"],
+            name=tool.name,
+            description=tool.description,
             parameters=schema
         )
         function_declarations.append(func_decl)
     
-    GEMINI_TOOLS = genai.protos.Tool(
+    return genai.protos.Tool(
         function_declarations=function_declarations
     )
 
-# --- Helper to call MCP Server ---
-def call_mcp_tool_executor(tool_name, params):
-    print(f"🤖 ChatApp: Calling MCP Server to execute '{tool_name}' with params: {params}")
-    try:
-        response = requests.post(
-            f"{MCP_SERVER_URL}/mcp/execute",
-            json={"tool_name": tool_name, "parameters": params}
-        )
-        response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
-        mcp_response_data = response.json()
-        print(f"MCP Server Response: {json.dumps(mcp_response_data, indent=2)}")
-        return mcp_response_data.get("result") # Return just the 'result' part of the MCP response
-    except requests.exceptions.RequestException as e:
-        print(f"🛑 ChatApp: Error calling MCP server for tool '{tool_name}': {e}")
-        if e.response is not None:
-            print(f"MCP Server Error Response Body: {e.response.text}")
-            try: # Try to parse error from MCP server if JSON
-                return e.response.json().get("result", {"error": f"MCP Server HTTP Error: {e.response.status_code}"})
-            except json.JSONDecodeError:
-                return {"error": f"MCP Server HTTP Error: {e.response.status_code} - {e.response.text}"}
-        return {"error": f"Failed to connect to MCP server: {str(e)}"}
-    except Exception as e_json: # Catch potential JSON parsing errors from successful requests
-        print(f"🛑 ChatApp: Error parsing JSON response from MCP server for tool '{tool_name}': {e_json}")
-        return {"error": f"Could not parse MCP server response: {str(e_json)}"}
-
-# --- Main Chat Logic ---
-def run_chat():
-    print(f"Interacting with {MODEL_NAME} using MCP tools. Type 'quit' to exit.")
-    print(f"Using {'New SDK (google.genai)' if USING_NEW_SDK else 'Legacy SDK (google.generativeai)'}")
-    print("Gemini has tools to operate on files within a server-defined sandboxed directory.")
-    print("All file paths used by Gemini will be relative to that sandbox.\n")
+GEMINI_TOOLS = _build_gemini_tools()
 
-    # Define the system message
-    system_message_text = """You are a helpful AI assistant specialized in coding tasks. You can assist me with understanding code, suggesting improvements, writing new code snippets, and making small updates to existing files.
+# --- System Prompts ---
+SYSTEM_PROMPT_VERBOSE = """You are a helpful AI assistant specialized in coding tasks. You can assist me with understanding code, suggesting improvements, writing new code snippets, and making small updates to existing files.
 
 For this conversation, you have been equipped with special tools to interact with a specific, sandboxed file system area provided by the server. This sandbox is where we will work with code files and related documents.
 
@@ -207,23 +257,253 @@ To effectively help with code updates and file management in the sandbox, follow
 Your goal is to assist me with coding tasks by intelligently using the available file system tools in the sandbox without requiring me to explicitly tell you which tool to use for every file operation.
 """
 
-    # Initialize the model
+SYSTEM_PROMPT_TERSE = """You are a helpful AI assistant specialized in coding tasks: understanding code, suggesting improvements, writing new code snippets, and making small updates to existing files.
+
+You have tools (`list_directory`, `read_file`, `write_file`) that operate on a sandboxed file system area provided by the server. All file paths are relative to the sandbox root, like "my_script.py" or "configs/settings.yaml". Use these tools whenever a request involves files in the sandbox, without waiting to be told which one to use, and ask me if you are unsure about paths or whether to overwrite.
+"""
+
+# The system prompt is resent with every turn, so the terse one is the default.
+# Select with GEMINI_SYSTEM_PROMPT=verbose|terse
+SYSTEM_PROMPTS = {"verbose": SYSTEM_PROMPT_VERBOSE, "terse": SYSTEM_PROMPT_TERSE}
+SYSTEM_PROMPT = SYSTEM_PROMPTS.get(os.environ.get("GEMINI_SYSTEM_PROMPT", "terse").lower(), SYSTEM_PROMPT_TERSE)
+
+# --- Helper to call MCP Server ---
+def _loads_mcp_json(data):
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        # orjson rejects escaped lone surrogates, which the server sends for non-UTF-8 filenames
+        return json.loads(data)
+
+def _normalize_tool_path(path):
+    return os.path.normpath(str(path or ".").lstrip('/\\'))
+
+def _invalidate_tool_cache(written_path):
+    # Drop cached reads of the written file and every cached directory listing,
+    # since any of them may now be stale.
+    global _TOOL_CACHE_GENERATION
+    written_path = _normalize_tool_path(written_path)
+    with _TOOL_CACHE_LOCK:
+        _TOOL_CACHE_GENERATION += 1
+        for key in list(_TOOL_CACHE):
+            cached_tool, cached_params = key
+            if cached_tool == "list_directory" or \
+                    _normalize_tool_path(json.loads(cached_params).get("path")) == written_path:
+                _TOOL_CACHE.pop(key, None)
+
+def call_mcp_tool_executor(tool_name, params):
+    if tool_name not in _TOOL_NAMES:
+        print(f"🛑 ChatApp: Gemini requested unknown tool '{tool_name}'")
+        return {"error": f"Unknown tool '{tool_name}'"}
+
+    # Only reads are cached; writes never pay for encoding their payload into a key
+    key = generation = None
+    if tool_name in _CACHEABLE:
+        try:
+            key = (tool_name, json.dumps(params, sort_keys=True))
+        except (TypeError, ValueError):
+            logger.debug("Not caching '%s': params are not JSON-serializable", tool_name)
+        else:
+            with _TOOL_CACHE_LOCK:
+                cached = _TOOL_CACHE.get(key)
+                generation = _TOOL_CACHE_GENERATION
+            if cached is not None:
+                logger.debug("Using cached result for '%s' with params: %s", tool_name, params)
+                return cached
+    if tool_name == "write_file":
+        _invalidate_tool_cache(params.get("path"))
+
+    logger.debug("Calling MCP Server to execute '%s' with params: %s", tool_name, params)
+    try:
+        body = orjson.dumps({"tool_name": tool_name, "parameters": params})
+        response = _MCP_SESSION.post(
+            _EXEC_URL,
+            data=body,
+            headers=_JSON_HEADERS,
+            timeout=(3.05, 30) # (connect, read) seconds
+        )
+        response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
+        mcp_response_data = _loads_mcp_json(response.content)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("MCP Server Response: %s", orjson.dumps(mcp_response_data, option=orjson.OPT_INDENT_2).decode())
+        result = mcp_response_data.get("result") # Return just the 'result' part of the MCP response
+        if key is not None and result is not None and "error" not in result:
+            with _TOOL_CACHE_LOCK:
+                if generation == _TOOL_CACHE_GENERATION:
+                    _TOOL_CACHE[key] = result
+        return result
+    except requests.exceptions.RequestException as e:
+        print(f"🛑 ChatApp: Error calling MCP server for tool '{tool_name}': {e}")
+        if e.response is not None:
+            print(f"MCP Server Error Response Body: {e.response.text}")
+            try: # Try to parse error from MCP server if JSON
+                return _loads_mcp_json(e.response.content).get("result", {"error": f"MCP Server HTTP Error: {e.response.status_code}"})
+            except json.JSONDecodeError: # Also covers orjson.JSONDecodeError
+                return {"error": f"MCP Server HTTP Error: {e.response.status_code} - {e.response.text}"}
+        return {"error": f"Failed to connect to MCP server: {str(e)}"}
+    except Exception as e_json: # Catch potential JSON parsing errors from successful requests
+        print(f"🛑 ChatApp: Error parsing JSON response from MCP server for tool '{tool_name}': {e_json}")
+        return {"error": f"Could not parse MCP server response: {str(e_json)}"}
+    finally:
+        if tool_name == "write_file":
+            # Again once the write has landed: reads that raced it may have cached old content
+            _invalidate_tool_cache(params.get("path"))
+
+# --- Helpers for streamed Gemini responses (both SDKs) ---
+def _chunk_function_calls(chunk):
+    """Returns the (tool_name, args) pairs carried by one streamed response chunk."""
     if USING_NEW_SDK:
-        model = CLIENT.models.get_model(MODEL_NAME)
-    else:
-        model = genai.GenerativeModel(MODEL_NAME, tools=[GEMINI_TOOLS])
+        fns = getattr(chunk, 'functions', None)
+        return [(fn.name, fn.args) for fn in fns] if fns else []
+    tool_calls = []
+    for part in chunk.candidates[0].content.parts:
+        fc = getattr(part, 'function_call', None)
+        if fc and fc.name:
+            tool_calls.append((fc.name, dict(fc.args)))
+    return tool_calls
+
+def _chunk_text(chunk):
+    if USING_NEW_SDK:
+        return getattr(chunk, 'text', None)
+    return "".join(getattr(part, 'text', '') for part in chunk.candidates[0].content.parts)
+
+def _function_response_message(tool_names, results):
+    """Builds a single message carrying every tool result of one Gemini turn."""
+    if USING_NEW_SDK:
+        return [
+            {"function_response": {"name": tool_name, "response": result}}
+            for tool_name, result in zip(tool_names, results)
+        ]
+    return [
+        genai.protos.Part(
+            function_response=genai.protos.FunctionResponse(
+                name=tool_name,
+                response=result
+            )
+        )
+        for tool_name, result in zip(tool_names, results)
+    ]
+
+def stream_turn(chat, message):
+    """
+    Streams Gemini's reply to `message`, printing text as it arrives and starting
+    each requested tool call on the worker pool as soon as it appears in the stream.
+    Returns the dispatched (tool_name, future) pairs and whether any text was printed.
+    """
+    pending_calls = []
+    printed_text = False
+    for chunk in chat.send_message(message, stream=True):
+        for tool_name, tool_args in _chunk_function_calls(chunk):
+            print(f"✨ Gemini wants to use tool: '{tool_name}' with arguments: {tool_args}")
+            pending_calls.append((tool_name, _TOOL_EXECUTOR.submit(call_mcp_tool_executor, tool_name, tool_args)))
+        text = _chunk_text(chunk)
+        if text:
+            print(text if printed_text else f"Gemini: {text}", end="", flush=True)
+            printed_text = True
+    if printed_text:
+        print()
+    return pending_calls, printed_text
+
+def _warm_up_mcp_connection():
+    # Open the keep-alive connection now so the first tool call doesn't pay for it.
+    try:
+        _MCP_SESSION.head(f"{MCP_SERVER_URL}/mcp/tools", timeout=2)
+    except requests.exceptions.RequestException as e:
+        logger.debug("MCP server warm-up failed: %s", e)
 
-    # Start chat with the system message in history
+def _load_model():
+    if USING_NEW_SDK:
+        return CLIENT.models.get_model(MODEL_NAME)
+    return genai.GenerativeModel(MODEL_NAME, tools=[GEMINI_TOOLS])
+
+def _delete_prompt_cache(cache_name):
+    try:
+        CLIENT.caches.delete(name=cache_name)
+    except Exception as e:
+        logger.debug("Could not delete context cache %s: %s", cache_name, e)
+
+def _create_prompt_cache():
+    """
+    Stores the static system prompt and tool declarations as Gemini cached content,
+    so they aren't billed and prefilled again on every turn.
+    Returns the cache name, or None if context caching isn't available.
+    """
+    if not USING_NEW_SDK or not hasattr(CLIENT, "caches"):
+        return None
+    try:
+        cached = CLIENT.caches.create(
+            model=MODEL_NAME,
+            config={"system_instruction": SYSTEM_PROMPT, "tools": GEMINI_TOOLS, "ttl": f"{PROMPT_CACHE_TTL_SECONDS}s"}
+        )
+    except Exception as e: # e.g. SDK without caching support, or content below the model's minimum cache size
+        logger.debug("Context caching unavailable, sending the system prompt in the chat history: %s", e)
+        return None
+    atexit.register(_delete_prompt_cache, cached.name)
+    return cached.name
+
+def _extend_prompt_cache(cache_name):
+    """Resets the context cache's TTL. Returns False if it could not (e.g. it already expired)."""
+    try:
+        CLIENT.caches.update(name=cache_name, config={"ttl": f"{PROMPT_CACHE_TTL_SECONDS}s"})
+        return True
+    except Exception as e:
+        logger.debug("Could not extend context cache %s: %s", cache_name, e)
+        return False
+
+def _start_chat(model, cache_name, history=()):
+    # Start chat with the system message in history, followed by any earlier conversation
     initial_history = [
-        {'role': 'user', 'parts': [{'text': system_message_text}]},
+        {'role': 'user', 'parts': [{'text': SYSTEM_PROMPT}]},
         {'role': 'model', 'parts': [{'text': 'Understood. I have file system tools available and will use them when appropriate for file-related tasks in my sandbox.'}]}
     ]
     
-    if USING_NEW_SDK:
-        chat = model.start_chat(history=initial_history, tools=GEMINI_TOOLS)
+    if cache_name:
+        # System prompt and tools are served from the context cache
+        return model.start_chat(cached_content=cache_name, history=list(history)), 0
+    elif USING_NEW_SDK:
+        return model.start_chat(history=initial_history + list(history), tools=GEMINI_TOOLS), len(initial_history)
     else:
-        chat = model.start_chat(history=initial_history)
+        return model.start_chat(history=initial_history + list(history)), len(initial_history)
+
+def _is_user_text(entry):
+    return getattr(entry, 'role', None) == 'user' and \
+        any(getattr(part, 'text', None) for part in getattr(entry, 'parts', None) or [])
+
+def trim_history(chat, prefix_len):
+    """
+    Bounds the context resent to Gemini by dropping the oldest turns, keeping the
+    first `prefix_len` entries (the system prompt exchange) and the recent window.
+    """
+    history = chat.history
+    if len(history) <= MAX_HISTORY_ENTRIES:
+        return
+    # Start the window on a user message so tool calls stay paired with their responses
+    start = len(history) - HISTORY_WINDOW
+    while start < len(history) and not _is_user_text(history[start]):
+        start += 1
+    if start >= len(history):
+        return
+    trimmed = list(history[:prefix_len]) + list(history[start:])
+    logger.debug("Trimming chat history from %d to %d entries", len(history), len(trimmed))
+    try:
+        chat.history = trimmed
+    except AttributeError: # SDK versions without a history setter
+        chat._history = trimmed
 
+# --- Main Chat Logic ---
+def run_chat():
+    # Warm up the MCP connection, fetch the model and create the prompt cache in the
+    # background; they only need to finish once the first message has been typed.
+    _TOOL_EXECUTOR.submit(_warm_up_mcp_connection)
+    model_future = _TOOL_EXECUTOR.submit(_load_model)
+    cache_future = _TOOL_EXECUTOR.submit(_create_prompt_cache)
+
+    print(f"Interacting with {MODEL_NAME} using MCP tools. Type 'quit' to exit.")
+    print(f"Using {'New SDK (google.genai)' if USING_NEW_SDK else 'Legacy SDK (google.generativeai)'}")
+    print("Gemini has tools to operate on files within a server-defined sandboxed directory.")
+    print("All file paths used by Gemini will be relative to that sandbox.\n")
+
+    chat = None
     while True:
         user_input = input("You: ")
         if user_input.lower() == 'quit':
@@ -234,80 +514,46 @@ Your goal is to assist me with coding tasks by intelligently using the available
             continue
 
         try:
+            if chat is None:
+                cache_name = cache_future.result()
+                cache_refresh_at = time.monotonic() + PROMPT_CACHE_TTL_SECONDS / 2
+                chat, history_prefix = _start_chat(model_future.result(), cache_name)
+            elif cache_name and time.monotonic() >= cache_refresh_at:
+                if not _extend_prompt_cache(cache_name):
+                    # Expired (e.g. the chat sat idle past the TTL): carry the conversation over
+                    # to a new cache, or to an uncached chat if one can't be created.
+                    cache_name = _create_prompt_cache()
+                    chat, history_prefix = _start_chat(model_future.result(), cache_name, chat.history)
+                cache_refresh_at = time.monotonic() + PROMPT_CACHE_TTL_SECONDS / 2
+
             print("🤖 Gemini is thinking...")
             
-            # Send message to Gemini
-            response = chat.send_message(user_input)
-            
-            # Handle potential function calls from Gemini based on SDK version
-            if USING_NEW_SDK:
-                # For the new SDK
-                while hasattr(response, 'functions') and response.functions:
-                    function_call = response.functions[0]
-                    tool_name = function_call.name
-                    tool_args = function_call.args
-                    
-                    print(f"✨ Gemini wants to use tool: '{tool_name}' with arguments: {tool_args}")
-                    
-                    # Execute the tool
-                    tool_execution_result = call_mcp_tool_executor(tool_name, tool_args)
-                    
-                    if tool_execution_result is None:
-                        tool_execution_result = {"error": "MCP tool execution failed to return data."}
-                    
-                    print(f"⚙️ ChatApp: Sending tool result back to Gemini: {tool_execution_result}")
-                    
-                    # Send the tool's result back to Gemini
-                    response = chat.send_message({
-                        "function_response": {
-                            "name": tool_name,
-                            "response": tool_execution_result
-                        }
-                    })
+            # Stream the reply; tool calls start running while Gemini is still generating
+            message = user_input
+            while True:
+                pending_calls, printed_text = stream_turn(chat, message)
+                if not pending_calls:
+                    break
                 
-                # Final response after any tool calls
-                if hasattr(response, 'text') and response.text:
-                    print(f"Gemini: {response.text}")
-                else:
-                    print("Gemini: (No text response after tool use, this might indicate an issue or completion of action)")
-            
-            else:
-                # For the legacy SDK
-                while hasattr(response.candidates[0].content.parts[0], 'function_call') and response.candidates[0].content.parts[0].function_call.name:
-                    fc = response.candidates[0].content.parts[0].function_call
-                    tool_name = fc.name
-                    tool_args = {key: value for key, value in fc.args.items()}
-                    
-                    print(f"✨ Gemini wants to use tool: '{tool_name}' with arguments: {tool_args}")
-                    
-                    # Execute the tool
-                    tool_execution_result = call_mcp_tool_executor(tool_name, tool_args)
-                    
-                    if tool_execution_result is None:
-                        tool_execution_result = {"error": "MCP tool execution failed to return data."}
-                    
-                    print(f"⚙️ ChatApp: Sending tool result back to Gemini: {tool_execution_result}")
-                    
-                    # Send the tool's result back to Gemini
-                    response = chat.send_message(
-                        genai.protos.Part(
-                            function_response=genai.protos.FunctionResponse(
-                                name=tool_name,
-                                response=tool_execution_result
-                            )
-                        )
-                    )
+                results = [future.result() for _, future in pending_calls]
+                results = [
+                    result if result is not None else {"error": "MCP tool execution failed to return data."}
+                    for result in results
+                ]
+                logger.debug("Sending tool results back to Gemini: %s", results)
                 
-                # Final response after any tool calls
-                if hasattr(response.candidates[0].content.parts[0], 'text') and response.candidates[0].content.parts[0].text:
-                    print(f"Gemini: {response.candidates[0].content.parts[0].text}")
-                else:
-                    print("Gemini: (No text response after tool use, this might indicate an issue or completion of action)")
+                # Send all of the tools' results back to Gemini in one message
+                message = _function_response_message([tool_name for tool_name, _ in pending_calls], results)
+            
+            if not printed_text:
+                print("Gemini: (No text response after tool use, this might indicate an issue or completion of action)")
+
+            trim_history(chat, history_prefix)
 
         except Exception as e:
             print(f"🛑 An error occurred: {e}")
-            import traceback
-            traceback.print_exc()
+            if logger.isEnabledFor(logging.DEBUG):
+                traceback.print_exc()
 
 if __name__ == '__main__':
     run_chat()
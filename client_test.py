@@ -1,5 +1,6 @@
 import requests
 import json
+import os
 
 MCP_SERVER_URL = "http://localhost:5003"
 
@@ -54,4 +55,17 @@ if __name__ == "__main__":
     traversal_payload = {"tool_name": "read_file", "parameters": {"path": "../../some_other_file.txt"}}
     traversal_result = call_mcp_server("/mcp/execute", method="POST", payload=traversal_payload)
     if traversal_result:
-        print(f"Result: {json.dumps(traversal_result, indent=2)}\n")
\ No newline at end of file
+        print(f"Result: {json.dumps(traversal_result, indent=2)}\n")
+
+    # 6. List a directory holding a non-UTF-8 filename (should still return JSON, not a 500)
+    # Created in the server's default sandbox; skipped where filenames must be valid Unicode.
+    print("6. Executing 'list_directory' on a directory with a non-UTF-8 filename...")
+    if os.name == "posix":
+        sandbox_dir = os.path.join(os.fsencode(os.path.dirname(os.path.abspath(__file__))), b"mcp_data_sandbox")
+        bad_dir = os.path.join(sandbox_dir, b"non_utf8_names")
+        os.makedirs(bad_dir, exist_ok=True)
+        open(os.path.join(bad_dir, b"bad\xff.txt"), "w").close()
+        bad_list_payload = {"tool_name": "list_directory", "parameters": {"path": "non_utf8_names"}}
+        bad_list_result = call_mcp_server("/mcp/execute", method="POST", payload=bad_list_payload)
+        if bad_list_result:
+            print(f"Result: {json.dumps(bad_list_result, indent=2)}\n")
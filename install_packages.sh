@@ -5,7 +5,7 @@
 python3 -m pip install --upgrade pip
 
 # Install the required packages
-python3 -m pip install flask requests
+python3 -m pip install flask requests cachetools orjson waitress
 
 # Try to install the Google AI SDK packages
 echo "Attempting to install Google AI packages..."
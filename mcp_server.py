@@ -1,28 +1,70 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask.json.provider import JSONProvider
+import codecs
+import errno
+import functools
+import gzip
+import hashlib
+import io
 import os
+import re
+import stat
+import threading
 import json
 import argparse
 import logging # Import logging module
+import orjson
+import cachetools
 
 # Configure basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# --- Fast JSON: route jsonify and request.json through orjson ---
+def dumps_json_bytes(obj):
+    try:
+        return orjson.dumps(obj)
+    except orjson.JSONEncodeError:
+        # orjson rejects lone surrogates, which os.scandir returns for non-UTF-8 filenames;
+        # the stdlib encoder escapes them (ensure_ascii) like Flask's default provider did.
+        return json.dumps(obj).encode()
+
+class OrjsonProvider(JSONProvider):
+    def dumps(self, obj, **kwargs):
+        return dumps_json_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Build the body as bytes directly; no str round trip for large file contents
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_json_bytes(obj), mimetype="application/json")
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+# Set MCP_DEV=1 for Flask's debug server and per-request INFO logging
+DEV_MODE = bool(os.environ.get("MCP_DEV"))
 
 # Route Flask logs to the basicConfig setup
-app.logger.setLevel(logging.INFO)
+app.logger.setLevel(logging.INFO if DEV_MODE else logging.WARNING)
 
 # --- Determine Base Directory (Sandbox) ---
+@functools.lru_cache(None)
 def get_base_dir():
-    parser = argparse.ArgumentParser(description="MCP Server for File System Access.")
-    parser.add_argument(
-        "--sandbox-dir",
-        type=str,
-        help="Path to the directory to be used as the secure sandbox for file operations."
-    )
-    args = parser.parse_args()
-
-    # 1. From Command-line argument
+    # 1. From Command-line argument (only when run as a script; under a WSGI server
+    # such as gunicorn, sys.argv belongs to the server and would trip argparse)
+    if __name__ == '__main__':
+        parser = argparse.ArgumentParser(description="MCP Server for File System Access.")
+        parser.add_argument(
+            "--sandbox-dir",
+            type=str,
+            help="Path to the directory to be used as the secure sandbox for file operations."
+        )
+        args = parser.parse_args()
+    else:
+        args = argparse.Namespace(sandbox_dir=None)
+
     if args.sandbox_dir:
         abs_path = os.path.abspath(args.sandbox_dir)
         app.logger.info(f"Attempting to use sandbox directory from command-line: {abs_path}")
@@ -57,6 +99,17 @@ elif not os.path.isdir(BASE_DIR):
     app.logger.critical("Please specify a valid directory path.")
     exit(1)
 
+# Prefix every path inside the sandbox starts with; the trailing separator keeps
+# sibling directories like '<BASE_DIR>_other' from matching.
+BASE_DIR_WITH_SEP = os.path.join(BASE_DIR, '')
+
+# Keep the sandbox open as a directory descriptor so tool paths are resolved relative to it
+# (openat) instead of re-walking BASE_DIR from '/' on every open. None where dir_fd is unsupported.
+if os.open in os.supports_dir_fd and hasattr(os, 'O_DIRECTORY'):
+    BASE_FD = os.open(BASE_DIR, os.O_RDONLY | os.O_DIRECTORY)
+else:
+    BASE_FD = None
+
 app.logger.info(f"✅ MCP Server configured. Sandbox for all file operations: {BASE_DIR}")
 app.logger.info(f"   All tool paths (read, write, list) will be relative to this directory.")
 
@@ -117,47 +170,203 @@ TOOLS_METADATA = [
     }
 ]
 
+# The tool list never changes after startup, so encode it once and let clients revalidate with ETags
+TOOLS_BODY = orjson.dumps(TOOLS_METADATA)
+TOOLS_ETAG = hashlib.md5(TOOLS_BODY, usedforsecurity=False).hexdigest()
+TOOLS_HEADERS = {'Cache-Control': 'public, max-age=300', 'ETag': f'"{TOOLS_ETAG}"', 'Vary': 'Accept-Encoding'}
+# Compressed once here too, for clients that accept gzip (its own ETag, as a separate representation)
+TOOLS_GZIP_BODY = gzip.compress(TOOLS_BODY, compresslevel=9)
+TOOLS_GZIP_ETAG = f"{TOOLS_ETAG}-gzip"
+TOOLS_GZIP_HEADERS = {**TOOLS_HEADERS, 'ETag': f'"{TOOLS_GZIP_ETAG}"', 'Content-Encoding': 'gzip'}
+
 # --- Helper: Safely join path and check it's within BASE_DIR ---
+# Leading separators to strip so requested paths are always treated as relative
+PATH_SEPARATORS = os.sep + (os.altsep or '')
+
+# Relative paths that normpath would leave unchanged: no leading, doubled or trailing
+# separators, no backslashes, and no '.' or '..' components. These are inside the
+# sandbox by construction. POSIX only; Windows paths always take the full route.
+CLEAN_RELATIVE_PATH = re.compile(r'(?:(?!\.\.?(?:/|$))[^/\\]+/)*(?!\.\.?$)[^/\\]+') if os.sep == '/' else None
+
+# Pure string work on the requested path, so results can be cached for repeat requests.
+@functools.lru_cache(maxsize=4096)
 def safe_join_and_check(relative_path_str):
+    # Fast path for the common, already-clean request: one compiled-regex check and a concatenation
+    if CLEAN_RELATIVE_PATH is not None and CLEAN_RELATIVE_PATH.fullmatch(relative_path_str):
+        return BASE_DIR_WITH_SEP + relative_path_str
+
     # Normalize to prevent '..' tricks.
     # Also ensure it's treated as relative by removing leading slashes if present.
-    normalized_path = os.path.normpath(relative_path_str.lstrip('/\\'))
+    normalized_path = os.path.normpath(relative_path_str.lstrip(PATH_SEPARATORS))
 
-    # Join with base directory.
-    full_path = os.path.abspath(os.path.join(BASE_DIR, normalized_path))
+    # Join with base directory. BASE_DIR is already absolute, so normpath is
+    # enough and avoids the getcwd() that abspath does.
+    full_path = os.path.normpath(os.path.join(BASE_DIR, normalized_path))
 
     # CRITICAL SECURITY CHECK: Ensure the resulting path is still within BASE_DIR.
-    if os.path.commonprefix([full_path, BASE_DIR]) != BASE_DIR:
+    # (Appending a separator lets BASE_DIR itself pass the same single prefix test.)
+    if not (full_path + os.sep).startswith(BASE_DIR_WITH_SEP):
         raise ValueError(f"Path traversal attempt or path outside allowed sandbox '{BASE_DIR}'.")
     return full_path
 
+# Files larger than this are streamed to the client in chunks instead of being
+# read, wrapped and encoded as one big string. Encoding one chunk at a time also
+# bounds how long a huge read holds the GIL: other request threads run between chunks.
+STREAM_READ_THRESHOLD = 64 * 1024
+STREAM_CHUNK_SIZE = 1 << 20
+
+def stream_file_response(f):
+    """Streams the execute response for read_file, JSON-escaping one chunk of `f` at a time.
+
+    The first chunk is read and decoded up front, so a file that isn't UTF-8 text (the
+    usual case: a binary file) raises here and gets a normal error result instead of a
+    200 whose body breaks off mid-string. Takes ownership of `f`.
+    """
+    # Decode incrementally (multi-byte characters may straddle chunks) with the
+    # same newline translation as text-mode open().
+    decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')(), translate=True)
+    # Read every chunk into one reusable buffer rather than allocating a new bytes
+    # object per read. (Not mmap: a concurrent overwrite truncating the file would
+    # turn page faults past the new end into SIGBUS for the whole server.)
+    buf = bytearray(STREAM_CHUNK_SIZE)
+    view = memoryview(buf)
+
+    def read_chunk():
+        n = f.readinto(buf)
+        return n, decoder.decode(view[:n], final=not n)
+
+    try:
+        first = read_chunk()
+    except BaseException:
+        f.close()
+        raise
+
+    def generate():
+        n, text = first
+        yield b'{"tool_name":"read_file","result":{"content":"'
+        while True:
+            if text:
+                yield orjson.dumps(text)[1:-1] # Escaped string body without the quotes
+            if not n:
+                break
+            n, text = read_chunk()
+        yield b'"}}'
+
+    response = Response(stream_with_context(generate()), mimetype='application/json')
+    response.call_on_close(f.close)
+    return response
+
+# O_NONBLOCK keeps a FIFO in the sandbox from blocking the open; it has no effect on regular files.
+READ_OPEN_FLAGS = os.O_RDONLY | getattr(os, 'O_NONBLOCK', 0)
+
+# Agents tend to re-probe the same missing paths; remember recent ENOENTs (by resolved path)
+# for a second so repeats skip the filesystem. write_file evicts whatever it creates.
+MISSING_PATHS = cachetools.TTLCache(maxsize=1024, ttl=1.0)
+MISSING_PATHS_LOCK = threading.Lock() # Requests are served from multiple threads
+
+def open_in_sandbox(target_path, flags, mode=0o777):
+    """os.open() for a path returned by safe_join_and_check, resolved against BASE_FD when available."""
+    if BASE_FD is None:
+        return os.open(target_path, flags, mode)
+    # target_path is normalized and inside BASE_DIR, so the remainder has no '..' components
+    return os.open(target_path[len(BASE_DIR_WITH_SEP):] or '.', flags, mode, dir_fd=BASE_FD)
+
+def is_known_missing(target_path):
+    with MISSING_PATHS_LOCK:
+        return target_path in MISSING_PATHS
+
+def mark_missing(target_path):
+    with MISSING_PATHS_LOCK:
+        MISSING_PATHS[target_path] = True
+
+def forget_missing(target_path):
+    """Evicts `target_path` and its parent directories, which a write may just have created."""
+    with MISSING_PATHS_LOCK:
+        if not MISSING_PATHS:
+            return
+        # Stop at BASE_DIR itself: for a root sandbox dirname('/') == '/' would never shrink
+        while target_path != BASE_DIR and target_path.startswith(BASE_DIR_WITH_SEP):
+            MISSING_PATHS.pop(target_path, None)
+            target_path = os.path.dirname(target_path)
+        MISSING_PATHS.pop(BASE_DIR, None)
+
+def write_all(fd, data):
+    """Writes all of `data` to `fd`, resuming after short writes without copying the buffer."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
 # --- Tool Implementations ---
 def tool_read_file(params):
     try:
         target_path = safe_join_and_check(params["path"])
-        if not os.path.isfile(target_path):
-            return {"error": f"Not a file or not found: {params['path']}"}
-        with open(target_path, 'r', encoding='utf-8') as f:
-            return {"content": f.read()}
+        if is_known_missing(target_path):
+            return {"error": f"Not a file or not found: {params['path']}"}, 400
+        # Open first and fstat the descriptor, rather than stat-ing the path and then opening it
+        try:
+            fd = open_in_sandbox(target_path, READ_OPEN_FLAGS)
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                mark_missing(target_path)
+            if e.errno in (errno.ENOENT, errno.ENOTDIR, errno.EISDIR):
+                return {"error": f"Not a file or not found: {params['path']}"}, 400
+            raise
+        st = os.fstat(fd)
+        if not stat.S_ISREG(st.st_mode):
+            os.close(fd)
+            return {"error": f"Not a file or not found: {params['path']}"}, 400
+        if st.st_size > STREAM_READ_THRESHOLD:
+            return stream_file_response(open(fd, 'rb', buffering=0)), 200
+        with open(fd, 'r', encoding='utf-8') as f:
+            return {"content": f.read()}, 200
+    except UnicodeDecodeError: # A ValueError too, so it must be caught before the traversal handler
+        return {"error": f"Not a UTF-8 text file: {params['path']}"}, 400
     except ValueError as ve: # From safe_join_and_check
         app.logger.warning(f"Path traversal attempt blocked for read_file: {params.get('path')} -> {ve}")
-        return {"error": str(ve)}
+        return {"error": str(ve)}, 400
     except Exception as e:
         app.logger.error(f"Error reading file {params.get('path')}: {e}", exc_info=True)
-        return {"error": f"Error reading file: {str(e)}"}
+        return {"error": f"Error reading file: {str(e)}"}, 400
 
 def tool_list_directory(params):
     try:
         target_path = safe_join_and_check(params.get("path", ".")) # Default to BASE_DIR itself
-        if not os.path.isdir(target_path):
-            return {"error": f"Not a directory or not found: {params.get('path', '.')}"}
-        return {"items": os.listdir(target_path)}
+        not_found = {"error": f"Not a directory or not found: {params.get('path', '.')}"}, 400
+        if is_known_missing(target_path):
+            return not_found
+        if BASE_FD is None:
+            try:
+                st = os.stat(target_path)
+            except OSError as e:
+                if e.errno == errno.ENOENT:
+                    mark_missing(target_path)
+                return not_found
+            if not stat.S_ISDIR(st.st_mode):
+                return not_found
+            dir_target = target_path
+        else:
+            # O_DIRECTORY makes the open itself fail with ENOTDIR for non-directories
+            try:
+                dir_target = open_in_sandbox(target_path, os.O_RDONLY | os.O_DIRECTORY)
+            except OSError as e:
+                if e.errno == errno.ENOENT:
+                    mark_missing(target_path)
+                if e.errno in (errno.ENOENT, errno.ENOTDIR):
+                    return not_found
+                raise
+        # scandir reuses the kernel's dirent records; entry.is_dir() etc. would need no extra stat
+        try:
+            with os.scandir(dir_target) as entries:
+                return {"items": [entry.name for entry in entries]}, 200
+        finally:
+            if BASE_FD is not None:
+                os.close(dir_target) # scandir works on its own duplicate of the descriptor
     except ValueError as ve: # From safe_join_and_check
         app.logger.warning(f"Path traversal attempt blocked for list_directory: {params.get('path')} -> {ve}")
-        return {"error": str(ve)}
+        return {"error": str(ve)}, 400
     except Exception as e:
         app.logger.error(f"Error listing directory {params.get('path', '.')}: {e}", exc_info=True)
-        return {"error": f"Error listing directory: {str(e)}"}
+        return {"error": f"Error listing directory: {str(e)}"}, 400
 
 def tool_write_file(params):
     try:
@@ -165,48 +374,45 @@ def tool_write_file(params):
         content = params.get("content")
         overwrite = params.get("overwrite", False) # Default to False if not provided
 
-        app.logger.info(f"Attempting to write file: {relative_path}, overwrite: {overwrite}, content length: {len(content) if content is not None else 0}")
+        if app.logger.isEnabledFor(logging.DEBUG):
+            app.logger.debug("Attempting to write file: %s, overwrite: %s, content length: %d",
+                             relative_path, overwrite, len(content) if content is not None else 0)
 
         if not relative_path or content is None:
             app.logger.error("Missing 'path' or 'content' parameter for write_file.")
-            return {"success": False, "error": "Missing 'path' or 'content' parameter."}
+            return {"success": False, "error": "Missing 'path' or 'content' parameter."}, 200
 
         target_path = safe_join_and_check(relative_path)
-        app.logger.info(f"Resolved absolute path: {target_path}")
-
-        if os.path.exists(target_path):
-            app.logger.info(f"File already exists: {target_path}")
-            if not overwrite:
-                app.logger.warning(f"File '{relative_path}' exists and overwrite is false.")
-                return {"success": False, "error": f"File '{relative_path}' already exists. Set 'overwrite: true' to replace."}
-            else:
-                app.logger.info(f"File '{relative_path}' exists, overwrite is true. Proceeding.")
-        
-        # Prevent writing to a directory
-        if os.path.isdir(target_path):
-            app.logger.error(f"Target path '{relative_path}' resolves to a directory: {target_path}")
-            return {"success": False, "error": f"Path '{relative_path}' is a directory, cannot write file."}
+        app.logger.debug("Resolved absolute path: %s", target_path)
 
-        # Ensure parent directory exists if writing to a subdirectory
+        # Ensure parent directory exists if writing to a subdirectory (no-op if it already does)
         parent_dir = os.path.dirname(target_path)
-        if not os.path.exists(parent_dir):
-            app.logger.info(f"Parent directory for '{relative_path}' does not exist: {parent_dir}. Creating it.")
-            try:
-                os.makedirs(parent_dir)
-                app.logger.info(f"Parent directory created: {parent_dir}")
-            except Exception as e_mkdir:
-                app.logger.error(f"Could not create parent directory for '{relative_path}': {str(e_mkdir)}", exc_info=True)
-                return {"success": False, "error": f"Could not create parent directory for '{relative_path}': {str(e_mkdir)}"}
-        else:
-             app.logger.info(f"Parent directory for '{relative_path}' already exists: {parent_dir}")
-
-
-        app.logger.info(f"Opening file for writing: {target_path}")
-        with open(target_path, 'w', encoding='utf-8') as f:
-            app.logger.info("Writing content to file...")
-            f.write(content)
-            # The file is automatically closed when exiting the 'with' block
-        app.logger.info("File closed after writing.")
+        try:
+            os.makedirs(parent_dir, exist_ok=True)
+        except Exception as e_mkdir:
+            app.logger.error(f"Could not create parent directory for '{relative_path}': {str(e_mkdir)}", exc_info=True)
+            return {"success": False, "error": f"Could not create parent directory for '{relative_path}': {str(e_mkdir)}"}, 200
+
+        # Let open() enforce the overwrite policy: without overwrite, O_EXCL fails atomically
+        # if the file already exists, so there is no exists-then-open race between writers.
+        flags = os.O_WRONLY | os.O_CREAT | (os.O_TRUNC if overwrite else os.O_EXCL)
+        app.logger.debug("Opening file for writing: %s", target_path)
+        try:
+            fd = open_in_sandbox(target_path, flags, 0o666) # Same permissions (before umask) as open()
+        except FileExistsError:
+            app.logger.warning(f"File '{relative_path}' exists and overwrite is false.")
+            return {"success": False, "error": f"File '{relative_path}' already exists. Set 'overwrite: true' to replace."}, 200
+        except IsADirectoryError:
+            # Prevent writing to a directory
+            app.logger.error(f"Target path '{relative_path}' resolves to a directory: {target_path}")
+            return {"success": False, "error": f"Path '{relative_path}' is a directory, cannot write file."}, 200
+        try:
+            app.logger.debug("Writing content to file...")
+            write_all(fd, content.encode('utf-8'))
+        finally:
+            os.close(fd)
+            forget_missing(target_path)
+        app.logger.debug("File closed after writing.")
 
         # Optional: Add a check after writing to confirm existence and size
         # This can help diagnose weird issues where open/write doesn't throw an error
@@ -225,61 +431,71 @@ def tool_write_file(params):
         #     # Decide if you want to return {"success": False, "error": "File did not appear on filesystem after write attempt."}
 
 
-        app.logger.info(f"Successfully finished write operation for file: {relative_path}")
-        return {"success": True, "message": f"File '{relative_path}' written successfully."}
+        app.logger.info("Successfully finished write operation for file: %s", relative_path)
+        return {"success": True, "message": f"File '{relative_path}' written successfully."}, 200
 
     except ValueError as ve: # From safe_join_and_check
         app.logger.warning(f"ValueError (path traversal likely) blocked for write_file path {params.get('path')}: {ve}")
-        return {"success": False, "error": str(ve)}
+        return {"success": False, "error": str(ve)}, 200
     except Exception as e:
         # This catches any other exceptions during file operations (open, write, makedirs)
         app.logger.error(f"Unexpected error during write_file operation for path {params.get('path')}: {e}", exc_info=True)
-        return {"success": False, "error": f"Error writing file: {str(e)}"}
+        return {"success": False, "error": f"Error writing file: {str(e)}"}, 200
+
+# Handlers return (result, status_code)
+TOOL_DISPATCH = {
+    "read_file": tool_read_file,
+    "list_directory": tool_list_directory,
+    "write_file": tool_write_file,
+}
 
 # --- MCP Endpoints ---
 @app.route('/mcp/tools', methods=['GET'])
 def get_tools():
-    return jsonify(TOOLS_METADATA)
+    # A fresh (cheap) Response per request; Response objects aren't safe to share between requests
+    if request.accept_encodings['gzip'] > 0:
+        body, etag, headers = TOOLS_GZIP_BODY, TOOLS_GZIP_ETAG, TOOLS_GZIP_HEADERS
+    else:
+        body, etag, headers = TOOLS_BODY, TOOLS_ETAG, TOOLS_HEADERS
+    if request.if_none_match.contains_weak(etag): # If-None-Match uses weak comparison (RFC 9110)
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype='application/json', headers=headers)
 
 @app.route('/mcp/execute', methods=['POST'])
 def execute_tool():
-    data = request.json
+    # Parse the raw body directly with orjson; cache=False avoids keeping a second copy of
+    # large write_file payloads on the request after they are decoded.
+    try:
+        data = orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError as e:
+        app.logger.error(f"Invalid JSON in tool execution request: {e}")
+        return jsonify({"error": f"Invalid JSON body: {e}"}), 400
     tool_name = data.get("tool_name")
     parameters = data.get("parameters", {})
 
-    app.logger.info(f"Received tool execution request: tool='{tool_name}', params={parameters}")
-
-    result = {}
-    status_code = 200
-
-    if tool_name == "read_file":
-        result = tool_read_file(parameters)
-    elif tool_name == "list_directory":
-        result = tool_list_directory(parameters)
-    elif tool_name == "write_file":
-        result = tool_write_file(parameters)
-        # write_file handles its own success/error reporting within the result dict
-        if not result.get("success", True) and "error" in result:
-             app.logger.warning(f"write_file reported failure: {result.get('error')}")
-             # Keep status_code 200 if it's a tool-reported failure (like 'file exists'),
-             # Use 400/500 if it was a fundamental problem processing the request.
-             # For now, let's assume tool-reported failure is still a successful _execution_ of the tool request.
-             pass
-    else:
-        result = {"error": f"Unknown tool: {tool_name}"}
-        status_code = 404
+    # %-style arguments: the (possibly huge) params/result reprs are only built if the level is enabled
+    app.logger.debug("Received tool execution request: tool='%s', params=%s", tool_name, parameters)
+
+    handler = TOOL_DISPATCH.get(tool_name)
+    if handler is None:
         app.logger.error(f"Unknown tool requested: {tool_name}")
+        return jsonify({"tool_name": tool_name, "result": {"error": f"Unknown tool: {tool_name}"}}), 404
 
-    # If an error key exists at the top level of result (from read/list or unhandled issues)
-    # and status hasn't been set to a specific error code yet.
-    # This check is mainly for read/list or unexpected errors in the tool execution wrapper itself.
-    # write_file uses the 'success' key to indicate its outcome.
-    if "error" in result and status_code == 200 and tool_name != "write_file":
-        # A non-write tool returned an error. Consider it a bad request or internal error.
+    result, status_code = handler(parameters)
+
+    # Large file reads come back as an already-built streaming response
+    if isinstance(result, Response):
+        app.logger.info(f"Streaming tool execution response for '{tool_name}'")
+        return result
+
+    # read/list errors (like file not found) come back as 400s; write_file reports its
+    # outcome through the 'success' key and keeps a 200 for tool-level failures like 'file exists'.
+    if status_code >= 400:
         app.logger.error(f"Tool '{tool_name}' returned an error: {result.get('error')}")
-        status_code = 400 # Use 400 for client-side logic errors (like file not found for read)
+    elif "error" in result:
+        app.logger.warning(f"{tool_name} reported failure: {result.get('error')}")
 
-    app.logger.info(f"Sending tool execution response (status={status_code}): {result}")
+    app.logger.debug("Sending tool execution response (status=%s): %s", status_code, result)
 
     return jsonify({"tool_name": tool_name, "result": result}), status_code
 
@@ -290,6 +506,16 @@ if __name__ == '__main__':
     print("Endpoints:")
     print("  GET  /mcp/tools        (Lists available tools)")
     print("  POST /mcp/execute     (Executes a tool)")
-    # Flask's debug mode also enables its logger by default.
-    # Setting debug=True is good for development.
-    app.run(host='0.0.0.0', port=5003, debug=True)
\ No newline at end of file
+    if DEV_MODE:
+        # Flask's debug mode (reloader, debugger) is single-process and meant for development only.
+        app.run(host='0.0.0.0', port=5003, debug=True)
+    else:
+        # Tool calls are independent file operations, so serve them from a thread pool.
+        # Under gunicorn instead: gunicorn -w $(nproc) -k gthread --threads 8 -b 0.0.0.0:5003 mcp_server:app
+        try:
+            from waitress import serve
+        except ImportError:
+            print("'waitress' is not installed (pip install waitress); falling back to Flask's threaded server.")
+            app.run(host='0.0.0.0', port=5003, threaded=True)
+        else:
+            serve(app, host='0.0.0.0', port=5003, threads=16)
\ No newline at end of file